@@ -1,35 +1,172 @@
 # models/grammar_corrector.py
+import os
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Iterator
 from typing import List, Dict
+import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers.modeling_outputs import BaseModelOutput
 import re
 
+from utils.text_cleaner import TOKEN_RE, finalize
+
+# Precompiled pattern for the token-level guardrail below.
+_RE_ALPHA_START = re.compile(r"[A-Za-z]")
+
+try:
+    import ctranslate2  # optional int8 inference backend
+except ImportError:
+    ctranslate2 = None
+
 PUBLIC_MODELS: List[str] = [
     "vennify/t5-base-grammar-correction",
     "prithivida/grammar_error_correcter_v1",
     "oliverguhr/grammar-correction",
 ]
 
-def _simple_tokens(t: str) -> List[str]:
-    return re.findall(r"[A-Za-z][A-Za-z\-']*|\d+|[^\w\s]", t)
-
-def _smart_join(tokens: List[str]) -> str:
-    out = ""
-    for tok in tokens:
-        if re.match(r"[A-Za-z0-9]", tok):
-            if out and out[-1].isalnum():
-                out += " " + tok
-            else:
-                out += tok if not out else " " + tok
+# Directory with a CTranslate2-converted model. Produce one with e.g.:
+#   ct2-transformers-converter --model vennify/t5-base-grammar-correction \
+#       --quantization int8 --output_dir ct2_t5
+# If present (and ctranslate2 is installed), it is preferred over the FP32
+# HF model: int8 GEMM moves ~4x fewer bytes and uses VNNI dot-product on CPU.
+CT2_MODEL_DIR = os.environ.get("GRAMMAR_CT2_DIR", "ct2_t5")
+
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Needleman–Wunsch token alignment for the proper-noun guardrail. The jitted
+# kernel works on int64 token ids; without numba a pure-Python version of the
+# same DP runs (token counts are small, so it stays acceptable).
+try:
+    import numpy as np
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+def _nw_align_py(src_ids, tgt_ids, match=2, gap=-1, mismatch=-1):
+    n, m = len(src_ids), len(tgt_ids)
+    score = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        score[i][0] = gap * i
+    for j in range(1, m + 1):
+        score[0][j] = gap * j
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            diag = score[i - 1][j - 1] + (match if src_ids[i - 1] == tgt_ids[j - 1] else mismatch)
+            up = score[i - 1][j] + gap
+            left = score[i][j - 1] + gap
+            score[i][j] = max(diag, up, left)
+    # Backtrace: every diagonal move pairs src token i-1 with tgt token j-1.
+    # On score ties prefer true-match diagonals, then gaps, and take a
+    # mismatch diagonal only as a last resort — otherwise an inserted target
+    # word can get paired with a locked source token it has nothing to do
+    # with.
+    mapping = [-1] * n
+    i, j = n, m
+    while i > 0 and j > 0:
+        is_match = src_ids[i - 1] == tgt_ids[j - 1]
+        diag = score[i - 1][j - 1] + (match if is_match else mismatch)
+        if is_match and score[i][j] == diag:
+            mapping[i - 1] = j - 1
+            i -= 1
+            j -= 1
+        elif score[i][j] == score[i - 1][j] + gap:
+            i -= 1
+        elif score[i][j] == score[i][j - 1] + gap:
+            j -= 1
         else:
-            out += tok
-    return re.sub(r"\s+([,.;:!?])", r"\1", out).strip()
+            mapping[i - 1] = j - 1
+            i -= 1
+            j -= 1
+    return mapping
+
+if _HAVE_NUMBA:
+    @njit(cache=True)
+    def _nw_align_nb(src_ids, tgt_ids, match=2, gap=-1, mismatch=-1):
+        n, m = src_ids.shape[0], tgt_ids.shape[0]
+        score = np.zeros((n + 1, m + 1), dtype=np.int64)
+        for i in range(1, n + 1):
+            score[i, 0] = gap * i
+        for j in range(1, m + 1):
+            score[0, j] = gap * j
+        for i in range(1, n + 1):
+            for j in range(1, m + 1):
+                diag = score[i - 1, j - 1] + (match if src_ids[i - 1] == tgt_ids[j - 1] else mismatch)
+                up = score[i - 1, j] + gap
+                left = score[i, j - 1] + gap
+                best = diag
+                if up > best:
+                    best = up
+                if left > best:
+                    best = left
+                score[i, j] = best
+        # Same tie-breaking as the Python fallback: match diagonal, gaps,
+        # mismatch diagonal last.
+        mapping = np.full(n, -1, dtype=np.int64)
+        i, j = n, m
+        while i > 0 and j > 0:
+            is_match = src_ids[i - 1] == tgt_ids[j - 1]
+            diag = score[i - 1, j - 1] + (match if is_match else mismatch)
+            if is_match and score[i, j] == diag:
+                mapping[i - 1] = j - 1
+                i -= 1
+                j -= 1
+            elif score[i, j] == score[i - 1, j] + gap:
+                i -= 1
+            elif score[i, j] == score[i, j - 1] + gap:
+                j -= 1
+            else:
+                mapping[i - 1] = j - 1
+                i -= 1
+                j -= 1
+        return mapping
+
+def _align_tokens(src_tok: List[str], tgt_tok: List[str]):
+    """Map each src token index to its aligned tgt index (-1 when deleted)."""
+    vocab: Dict[str, int] = {}
+    def _ids(tokens):
+        return [vocab.setdefault(t.lower(), len(vocab)) for t in tokens]
+    src_ids, tgt_ids = _ids(src_tok), _ids(tgt_tok)
+    if _HAVE_NUMBA:
+        return _nw_align_nb(
+            np.asarray(src_ids, dtype=np.int64), np.asarray(tgt_ids, dtype=np.int64)
+        )
+    return _nw_align_py(src_ids, tgt_ids)
+
+def _find_lock_target(out: List[str], j: int, canon_low: str, src_low: str) -> int:
+    """Index near j of the token that resembles the locked noun, else -1.
+
+    Exact hits on the canonical or source spelling win outright; otherwise
+    the fuzziest neighbour is taken if it clears a 0.5 similarity ratio.
+    """
+    best_j, best_r = -1, 0.0
+    for jj in range(max(0, j - 2), min(len(out), j + 3)):
+        tok = out[jj]
+        if not _RE_ALPHA_START.match(tok):
+            continue
+        low = tok.lower()
+        if low == canon_low or low == src_low:
+            return jj
+        r = SequenceMatcher(None, low, canon_low).ratio()
+        if r > best_r:
+            best_r, best_j = r, jj
+    return best_j if best_r >= 0.5 else -1
+
+def _simple_tokens(t: str) -> List[str]:
+    return TOKEN_RE.findall(t)
 
 class GrammarCorrector:
     def __init__(self, model_name: str | None = None):
         self.model_name = model_name
         self.tokenizer = None
         self.model = None
+        self.translator = None
         self._load_first_available()
+        # Encoder forward dominates cost on paragraph-length input; cache it
+        # per prompt so toggling beams/max_new_tokens only re-runs the decoder.
+        self._encode = lru_cache(maxsize=8)(self._encode_uncached)
 
     def _load_first_available(self):
         candidates = [self.model_name] if self.model_name else PUBLIC_MODELS
@@ -39,7 +176,15 @@ class GrammarCorrector:
                 continue
             try:
                 self.tokenizer = AutoTokenizer.from_pretrained(name)
-                self.model = AutoModelForSeq2SeqLM.from_pretrained(name)
+                if ctranslate2 is not None and os.path.isdir(CT2_MODEL_DIR):
+                    self.translator = ctranslate2.Translator(
+                        CT2_MODEL_DIR,
+                        compute_type="int8",
+                        intra_threads=os.cpu_count(),
+                    )
+                else:
+                    self.model = AutoModelForSeq2SeqLM.from_pretrained(name)
+                    self._optimize_torch_model()
                 self.model_name = name
                 return
             except Exception as e:
@@ -49,9 +194,64 @@ class GrammarCorrector:
             "Tried: " + ", ".join([c for c in candidates if c]) + f". Last error: {last_err}"
         )
 
+    def _optimize_torch_model(self):
+        """Best-effort CPU inference tuning; every step degrades gracefully."""
+        self.model.eval()
+        # Fused attention projections + torch scaled_dot_product_attention
+        # instead of the vanilla eager attention path.
+        try:
+            from optimum.bettertransformer import BetterTransformer
+            self.model = BetterTransformer.transform(self.model)
+        except Exception:
+            pass  # optimum not installed, or transformers already uses SDPA natively
+        # bfloat16 halves GEMM bandwidth, but only pays off where the CPU has
+        # native bf16 tiles (AMX); elsewhere emulation would slow things down.
+        try:
+            if getattr(torch.cpu, "_is_amx_tile_supported", lambda: False)():
+                self.model = self.model.to(torch.bfloat16)
+        except Exception:
+            pass
+        # TorchInductor removes the per-decoder-step Python dispatch that
+        # dominates short-sequence CPU decoding. Compile the forward itself:
+        # wrapping the module would be a no-op here, since generate() is
+        # delegated to the original module and its decoding loop would call
+        # the uncompiled forward. Persist compiled graphs on disk so process
+        # restarts don't recompile, and warm up immediately so the first
+        # user request doesn't pay the trace.
+        original_forward = self.model.forward
+        try:
+            torch._inductor.config.fx_graph_cache = True
+            self.model.forward = torch.compile(
+                original_forward, mode="reduce-overhead", dynamic=True
+            )
+            self._warmup()
+        except Exception:
+            # Compilation is deferred to the first call, so a failure lands
+            # here during warmup — put the eager forward back, otherwise the
+            # broken compiled wrapper would re-raise on every user request.
+            self.model.forward = original_forward
+
+    def _warmup(self):
+        dummy = self.tokenizer(
+            self._build_prompt("this is a warmup sentence."),
+            return_tensors="pt",
+            truncation=True,
+        )
+        with torch.no_grad():
+            self.model.generate(**dummy, max_new_tokens=16, num_beams=1, do_sample=False)
+
     def _build_prompt(self, text: str) -> str:
         return "grammar: correct grammar and spelling, keep names and places unchanged: " + text
 
+    def _encode_uncached(self, prompt: str):
+        """Tokenize and run the encoder once; result is memoized via lru_cache."""
+        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True)
+        with torch.no_grad():
+            encoder_outputs = self.model.get_encoder()(
+                inputs["input_ids"], attention_mask=inputs["attention_mask"]
+            )
+        return encoder_outputs.last_hidden_state, inputs["attention_mask"]
+
     # -------- Generation --------
     def _generate(
         self,
@@ -59,11 +259,31 @@ class GrammarCorrector:
         num_beams: int = 8,
         max_new_tokens: int = 128,
         topk: int = 1,
-        do_sample: bool = True,
-        temperature: float = 0.9,
-        top_p: float = 0.92,
+        num_beam_groups: int = 1,
+        diversity_penalty: float = 0.0,
     ) -> List[str]:
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True)
+        if self.translator is not None:
+            return self._generate_ct2(prompt, num_beams=num_beams, max_new_tokens=max_new_tokens, topk=topk)
+
+        last_hidden_state, attention_mask = self._encode(prompt)
+
+        if num_beams == 1 and topk == 1:
+            # True greedy decode: omitting length_penalty/early_stopping/
+            # no_repeat_ngram_size skips the beam scorer buffers and the
+            # per-step ngram ban bookkeeping entirely. repetition_penalty is
+            # a single O(vocab) vector op per step and stands in for the far
+            # costlier per-step ngram banning.
+            encoder_outputs = BaseModelOutput(last_hidden_state=last_hidden_state)
+            outputs = self.model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                num_beams=1,
+                do_sample=False,
+                repetition_penalty=1.2,
+            )
+            return [self.tokenizer.decode(outputs[0], skip_special_tokens=True)]
+
         kwargs = dict(
             max_new_tokens=max_new_tokens,
             num_beams=num_beams,
@@ -71,21 +291,184 @@ class GrammarCorrector:
             length_penalty=0.7,
             no_repeat_ngram_size=3,
             early_stopping=True,
-            do_sample=do_sample,
+            do_sample=False,
+        )
+        if num_beam_groups > 1:
+            kwargs.update(dict(num_beam_groups=num_beam_groups, diversity_penalty=diversity_penalty))
+        # Wrap in a fresh BaseModelOutput each call: generate() expands
+        # encoder_outputs in place for beam search, which must not touch
+        # the cached tensor.
+        encoder_outputs = BaseModelOutput(last_hidden_state=last_hidden_state)
+        outputs = self.model.generate(
+            encoder_outputs=encoder_outputs, attention_mask=attention_mask, **kwargs
         )
-        if do_sample:
-            kwargs.update(dict(temperature=temperature, top_p=top_p))
-        outputs = self.model.generate(**inputs, **kwargs)
         return [self.tokenizer.decode(o, skip_special_tokens=True) for o in outputs]
 
+    def _generate_batch(
+        self,
+        prompts: List[str],
+        num_beams: int = 6,
+        max_new_tokens: int = 128,
+    ) -> List[str]:
+        """Decode several prompts in one padded batch (one best output each).
+
+        Short sequences in the batch finish early but keep the decoder GEMMs
+        dense, which beats issuing one long sequence or N separate calls.
+        """
+        if self.translator is not None:
+            token_lists = [
+                self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(p))
+                for p in prompts
+            ]
+            results = self.translator.translate_batch(
+                token_lists,
+                beam_size=num_beams,
+                max_decoding_length=max_new_tokens,
+                length_penalty=0.7,
+                no_repeat_ngram_size=3,
+            )
+            return [
+                self.tokenizer.decode(
+                    self.tokenizer.convert_tokens_to_ids(r.hypotheses[0]),
+                    skip_special_tokens=True,
+                )
+                for r in results
+            ]
+
+        # Encode per prompt through the lru_cache rather than tokenizing the
+        # whole batch from scratch: repeated sentences (reruns, overlapping
+        # paragraphs) skip their encoder pass, and the padded batch is
+        # reassembled here from the cached states and masks.
+        encoded = [self._encode(p) for p in prompts]
+        max_len = max(h.shape[1] for h, _ in encoded)
+        hidden = encoded[0][0].new_zeros((len(encoded), max_len, encoded[0][0].shape[-1]))
+        attention_mask = encoded[0][1].new_zeros((len(encoded), max_len))
+        for b, (h, m) in enumerate(encoded):
+            hidden[b, : h.shape[1]] = h[0]
+            attention_mask[b, : m.shape[1]] = m[0]
+        encoder_outputs = BaseModelOutput(last_hidden_state=hidden)
+
+        if num_beams == 1:
+            # Same greedy fast path as _generate: no beam/ngram machinery,
+            # repetition_penalty as the cheap repetition guard.
+            outputs = self.model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                num_beams=1,
+                do_sample=False,
+                repetition_penalty=1.2,
+            )
+        else:
+            outputs = self.model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                num_beams=num_beams,
+                length_penalty=0.7,
+                no_repeat_ngram_size=3,
+                early_stopping=True,
+                do_sample=False,
+            )
+        return [self.tokenizer.decode(o, skip_special_tokens=True) for o in outputs]
+
+    def _generate_ct2(
+        self,
+        prompt: str,
+        num_beams: int = 8,
+        max_new_tokens: int = 128,
+        topk: int = 1,
+    ) -> List[str]:
+        """Int8 decode via CTranslate2; same contract as the HF path."""
+        tokens = self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(prompt))
+        results = self.translator.translate_batch(
+            [tokens],
+            beam_size=max(num_beams, topk),
+            max_decoding_length=max_new_tokens,
+            num_hypotheses=topk,
+            length_penalty=0.7,
+            no_repeat_ngram_size=3,
+        )
+        outs = []
+        for hyp in results[0].hypotheses[:topk]:
+            ids = self.tokenizer.convert_tokens_to_ids(hyp)
+            outs.append(self.tokenizer.decode(ids, skip_special_tokens=True))
+        return outs
+
     # -------- Public API --------
     def correct(self, text: str) -> str:
         prompt = self._build_prompt(text)
-        return self._generate(prompt, num_beams=6, max_new_tokens=128, topk=1, do_sample=False)[0]
+        return self._generate(prompt, num_beams=6, max_new_tokens=128, topk=1)[0]
 
     def correct_with_params(self, text: str, num_beams: int = 6, max_new_tokens: int = 128) -> str:
+        # Multi-sentence paragraphs decode faster as a padded batch of short
+        # sequences than as one long sequence.
+        sentences = [s for s in _SENT_SPLIT_RE.split(text) if s.strip()]
+        if len(sentences) > 1:
+            prompts = [self._build_prompt(s) for s in sentences]
+            return " ".join(
+                self._generate_batch(prompts, num_beams=num_beams, max_new_tokens=max_new_tokens)
+            )
         prompt = self._build_prompt(text)
-        return self._generate(prompt, num_beams=num_beams, max_new_tokens=max_new_tokens, topk=1, do_sample=False)[0]
+        return self._generate(prompt, num_beams=num_beams, max_new_tokens=max_new_tokens, topk=1)[0]
+
+    def correct_stream(self, text: str, max_new_tokens: int = 128) -> Iterator[str]:
+        """Greedy-decode `text`, yielding the growing output as tokens land.
+
+        Total compute matches correct_with_params(num_beams=1); the win is
+        perceived first-token latency in the UI. HF streamers only support
+        single-beam decoding, and the CT2 backend has no streamer — both
+        fallbacks yield the finished text once.
+        """
+        if self.translator is not None:
+            yield self.correct_with_params(text, num_beams=1, max_new_tokens=max_new_tokens)
+            return
+
+        import queue
+        from transformers import TextIteratorStreamer
+
+        inputs = self.tokenizer(self._build_prompt(text), return_tensors="pt", truncation=True)
+        # The timeout is a last resort against a wedged worker; the normal
+        # failure path signals the consumer via streamer.end() below.
+        streamer = TextIteratorStreamer(self.tokenizer, skip_special_tokens=True, timeout=60.0)
+        errors: List[BaseException] = []
+
+        def _decode():
+            try:
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    num_beams=1,
+                    do_sample=False,
+                    repetition_penalty=1.2,
+                    streamer=streamer,
+                )
+            except BaseException as e:  # re-raised on the consumer side
+                errors.append(e)
+            finally:
+                # generate() only calls end() on success; without this the
+                # consumer would block on the queue for the full timeout
+                # before noticing the worker died. Redundant on success (the
+                # consumer has already seen the first stop signal).
+                streamer.end()
+
+        worker = threading.Thread(target=_decode)
+        worker.start()
+        acc = ""
+        try:
+            for piece in streamer:
+                acc += piece
+                yield acc
+        except queue.Empty:
+            pass  # worker stopped feeding the stream; surface its error below
+        worker.join()
+        if errors:
+            raise errors[0]
+
+    def correct_batch(self, texts: List[str], num_beams: int = 6, max_new_tokens: int = 128) -> List[str]:
+        """Correct several independent texts in one padded generate call."""
+        prompts = [self._build_prompt(t) for t in texts]
+        return self._generate_batch(prompts, num_beams=num_beams, max_new_tokens=max_new_tokens)
 
     def correct_topk(
         self,
@@ -95,21 +478,19 @@ class GrammarCorrector:
         max_new_tokens: int = 128
     ) -> List[str]:
         prompt = self._build_prompt(text)
-        raw = self._generate(
+        # Diverse beam search: one forward pass yields k distinct hypotheses,
+        # so no sampling variance and no dedupe needed afterwards.
+        beams = max(num_beams, 2 * k)
+        if beams % k:  # beam count must be divisible by the group count
+            beams += k - (beams % k)
+        return self._generate(
             prompt,
-            num_beams=num_beams,
+            num_beams=beams,
             max_new_tokens=max_new_tokens,
             topk=k,
-            do_sample=True,
-            temperature=0.95,      # slightly higher for more variety
-            top_p=0.9,
+            num_beam_groups=k,
+            diversity_penalty=0.5,
         )
-        seen, outs = set(), []
-        for cand in raw:
-            if cand not in seen:
-                outs.append(cand)
-                seen.add(cand)
-        return outs[:k]
 
     # -------- Proper-noun guardrail --------
     def enforce_locked_proper_nouns(
@@ -124,32 +505,29 @@ class GrammarCorrector:
         src_tok = _simple_tokens(original_after_spell)
         tgt_tok = _simple_tokens(corrected)
 
-        i = j = 0
-        out: List[str] = []
+        # Proper alignment instead of the old lockstep walk: when the model
+        # inserts or drops words, each locked source index still lands on the
+        # output token it actually corresponds to.
+        mapping = _align_tokens(src_tok, tgt_tok)
 
-        while i < len(src_tok) and j < len(tgt_tok):
-            s_is_word = bool(re.match(r"[A-Za-z]", src_tok[i]))
-            t_is_word = bool(re.match(r"[A-Za-z]", tgt_tok[j]))
-
-            if s_is_word and (i in locked_positions) and t_is_word:
-                canon = locked_positions[i]
-                out.append(canon)
-                i += 1
-                j += 1
+        out = list(tgt_tok)
+        for i, canon in locked_positions.items():
+            i = int(i)
+            if not (0 <= i < len(mapping)):
                 continue
-
-            out.append(tgt_tok[j])
-            i += 1
-            j += 1
-
-        out.extend(tgt_tok[j:])
-        text = _smart_join(out)
-
-        # Final adjacent duplicate word removal
-        tokens = _simple_tokens(text)
-        dedup: List[str] = []
-        for tok in tokens:
-            if dedup and re.match(r"[A-Za-z]", tok) and re.match(r"[A-Za-z]", dedup[-1]) and tok.lower() == dedup[-1].lower():
+            j = mapping[i]
+            if j < 0:
                 continue
-            dedup.append(tok)
-        return _smart_join(dedup)
+            # Only overwrite a token that plausibly IS the locked noun — the
+            # canonical form, the (possibly mangled) source spelling, or a
+            # close variant. The id-level alignment cannot tell which of two
+            # mismatched words is the noun, so look through a small window
+            # around the aligned slot; unrelated words the model inserted
+            # fail the similarity bar and survive.
+            jj = _find_lock_target(out, j, canon.lower(), src_tok[i].lower())
+            if jj >= 0:
+                out[jj] = canon
+
+        # finalize() dedupes adjacent duplicate words while joining, so no
+        # re-tokenize / second join pass is needed.
+        return finalize(out)
@@ -1,8 +1,18 @@
 # models/spell_checker.py
+import math
 import re
 from difflib import get_close_matches
 from typing import Dict, Tuple
 from spellchecker import SpellChecker
+from utils.text_cleaner import TOKEN_RE, smart_join
+
+# Precompiled hot-path patterns — these run once per token/candidate, so
+# avoid the per-call re.* cache lookup.
+_RE_ALPHA_START = re.compile(r"[A-Za-z]")
+_RE_AM_STATE = re.compile(r"\b(I|i)\s+am\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)\b")
+_RE_SPACE_COMMA = re.compile(r"\s+,")
+_RE_COMMA_WORD = re.compile(r",([A-Za-z])")
+_RE_HOME_LOT = re.compile(r"\bhome lot\b", re.IGNORECASE)
 
 # ---------------- Abbreviation expansion ----------------
 ABBREV = {
@@ -107,6 +117,21 @@ ABBREV = {
     "talkathon": "hackathon",
 }
 
+# One compiled alternation rewrites every abbreviation in a single C-level
+# scan instead of tokenize → per-token dict lookup → rejoin. Longest keys
+# first so multi-word entries ("thik h") win over their prefixes. The
+# anchors are lookarounds over [\w'-] rather than bare \b: apostrophes and
+# hyphens sit inside word tokens for this pipeline's tokenizer, and \b
+# would otherwise rewrite fragments of words like "I'd" or "u-turn".
+_ABBREV_RE = re.compile(
+    r"(?<![\w'-])(?:"
+    + "|".join(re.escape(k) for k in sorted(ABBREV, key=len, reverse=True))
+    + r")(?![\w'-])"
+)
+
+def _abbrev_sub(m: "re.Match") -> str:
+    return ABBREV[m.group(0)]
+
 # ---------------- Proper‑noun lexicon (compact seed) ----------------
 INDIAN_STATES = [
     "Andhra Pradesh","Arunachal Pradesh","Assam","Bihar","Chhattisgarh","Goa",
@@ -134,6 +159,104 @@ LEX_STATE = {s.lower(): s for s in INDIAN_STATES}
 LEX_CITY  = {c.lower(): c for c in POPULAR_CITIES}
 LEX_NAME  = {n.lower(): n for n in COMMON_FIRST_NAMES}
 ALL_LEX   = {**LEX_STATE, **LEX_CITY, **LEX_NAME}  # lowercase → Canonical
+# Materialized once — every per-call list(ALL_LEX.keys()) was throwaway
+# allocation plus GC pressure on each alpha token.
+_ALL_LEX_KEYS: list = list(ALL_LEX.keys())
+
+# Bucket the lexicon by first letter once at import. At cutoff≈0.94 a
+# candidate with a different initial (or a wildly different length) can
+# never pass, so the fuzzy matcher only needs to scan one small bucket.
+_LEX_BY_FIRST: Dict[str, list] = {}
+for _k in _ALL_LEX_KEYS:
+    _LEX_BY_FIRST.setdefault(_k[0], []).append(_k)
+
+def _bucket_candidates(low: str, cutoff: float) -> list:
+    """Keys sharing the token's first letter, length within the edit budget."""
+    window = math.ceil((1.0 - cutoff) * len(low))
+    return [
+        k for k in _LEX_BY_FIRST.get(low[0], ())
+        if abs(len(k) - len(low)) <= window
+    ]
+
+# ---------------- Fast fuzzy matcher (optional numba) ----------------
+# difflib's SequenceMatcher is pure Python and O(n·m²) per token, which
+# dominates spell correction on paragraph input. When numba+numpy are
+# available we match against a packed uint8 lexicon with a bounded
+# Levenshtein kernel instead; otherwise the difflib path below still works.
+try:
+    import numpy as np
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+if _HAVE_NUMBA:
+    _LEX_KEYS = _ALL_LEX_KEYS
+    _LEX_MAXLEN = max(len(k) for k in _LEX_KEYS)
+    _LEX_BYTES = np.zeros((len(_LEX_KEYS), _LEX_MAXLEN), dtype=np.uint8)
+    _LEX_LENS = np.zeros(len(_LEX_KEYS), dtype=np.int64)
+    for _i, _k in enumerate(_LEX_KEYS):
+        _b = _k.encode("utf-8")
+        _LEX_BYTES[_i, : len(_b)] = np.frombuffer(_b, dtype=np.uint8)
+        _LEX_LENS[_i] = len(_b)
+
+    # First-letter buckets as index arrays so the kernel only visits
+    # candidates that can actually pass the cutoff.
+    _LEX_KEY_INDEX = {k: i for i, k in enumerate(_LEX_KEYS)}
+    _LEX_IDX_BY_FIRST = {
+        first: np.array([_LEX_KEY_INDEX[k] for k in keys], dtype=np.int64)
+        for first, keys in _LEX_BY_FIRST.items()
+    }
+
+    @njit(cache=True)
+    def _best_match(token, idxs, lex_bytes, lex_lens, cutoff):
+        """Return (best_index, best_ratio) over the packed lexicon.
+
+        ratio = 1 - edit_distance / max(len); rows whose running minimum
+        already exceeds the allowed distance abort early.
+        """
+        n = token.shape[0]
+        best_idx = -1
+        best_ratio = cutoff
+        prev = np.empty(_LEX_MAXLEN + 1, dtype=np.int64)
+        curr = np.empty(_LEX_MAXLEN + 1, dtype=np.int64)
+        for ii in range(idxs.shape[0]):
+            i = idxs[ii]
+            m = lex_lens[i]
+            longer = n if n > m else m
+            max_dist = int((1.0 - best_ratio) * longer)
+            if abs(n - m) > max_dist:
+                continue
+            for j in range(m + 1):
+                prev[j] = j
+            dist = 0
+            aborted = False
+            for r in range(1, n + 1):
+                curr[0] = r
+                row_min = r
+                for j in range(1, m + 1):
+                    cost = 0 if token[r - 1] == lex_bytes[i, j - 1] else 1
+                    d = prev[j] + 1
+                    if curr[j - 1] + 1 < d:
+                        d = curr[j - 1] + 1
+                    if prev[j - 1] + cost < d:
+                        d = prev[j - 1] + cost
+                    curr[j] = d
+                    if d < row_min:
+                        row_min = d
+                if row_min > max_dist:
+                    aborted = True
+                    break
+                for j in range(m + 1):
+                    prev[j] = curr[j]
+            if aborted:
+                continue
+            dist = prev[m]
+            ratio = 1.0 - dist / longer
+            if ratio > best_ratio or (ratio == best_ratio and best_idx < 0):
+                best_ratio = ratio
+                best_idx = i
+        return best_idx, best_ratio
 
 # ---------------- Helpers ----------------
 def _closest_proper(token: str, cutoff: float = 0.94) -> Tuple[str, str] | None:
@@ -149,7 +272,25 @@ def _closest_proper(token: str, cutoff: float = 0.94) -> Tuple[str, str] | None:
         else: tag = "person"
         return ALL_LEX[low], tag
 
-    match = get_close_matches(low, list(ALL_LEX.keys()), n=1, cutoff=cutoff)
+    if _HAVE_NUMBA:
+        idxs = _LEX_IDX_BY_FIRST.get(low[0])
+        if idxs is None:
+            return None
+        tok = np.frombuffer(low.encode("utf-8"), dtype=np.uint8)
+        idx, ratio = _best_match(tok, idxs, _LEX_BYTES, _LEX_LENS, cutoff)
+        if idx < 0:
+            return None
+        m = _LEX_KEYS[idx]
+        tag = "state" if m in LEX_STATE else ("city" if m in LEX_CITY else "person")
+        # Person names: demand higher certainty (reduces false locks)
+        if tag == "person" and ratio < max(0.96, cutoff):
+            return None
+        return ALL_LEX[m], tag
+
+    candidates = _bucket_candidates(low, cutoff)
+    if not candidates:
+        return None
+    match = get_close_matches(low, candidates, n=1, cutoff=cutoff)
     if match:
         m = match[0]
         tag = "state" if m in LEX_STATE else ("city" if m in LEX_CITY else "person")
@@ -161,48 +302,49 @@ def _closest_proper(token: str, cutoff: float = 0.94) -> Tuple[str, str] | None:
 
 def _retok(text: str):
     # word/punct tokenizer sufficient for chatty inputs
-    return re.findall(r"[A-Za-z][A-Za-z\-']*|\d+|[^\w\s]", text, flags=re.UNICODE)
-
-def _smart_join(tokens):
-    out = ""
-    for t in tokens:
-        if re.match(r"[A-Za-z0-9]", t):
-            if out and (out[-1].isalnum() or out[-1] in {')',']','"',"'"}):
-                out += " " + t
-            else:
-                out += t if not out else " " + t
-        else:
-            out += t
-    return re.sub(r"\s+([,.;:!?])", r"\1", out).strip()
+    return TOKEN_RE.findall(text)
 
 def _light_post_edits(text: str) -> str:
     # Insert 'from' after "I am <State>" if missing (model often omits 'from')
-    text = re.sub(
-        r"\b(I|i)\s+am\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)\b",
-        r"\1 am from \2",
-        text,
-    )
+    text = _RE_AM_STATE.sub(r"\1 am from \2", text)
     # Fix spacing around commas if any slipped through
-    text = re.sub(r"\s+,", ",", text)
-    text = re.sub(r",([A-Za-z])", r", \1", text)
+    text = _RE_SPACE_COMMA.sub(",", text)
+    text = _RE_COMMA_WORD.sub(r", \1", text)
     # Normalize "home lot" -> "home a lot"
-    text = re.sub(r"\bhome lot\b", "home a lot", text, flags=re.IGNORECASE)
+    text = _RE_HOME_LOT.sub("home a lot", text)
     return text
 
 # ---------------- SpellCorrector ----------------
 class SpellCorrector:
     def __init__(self):
         self.spell = SpellChecker()
+        # Snapshot the vocabulary once: membership tests against a frozenset
+        # skip pyspellchecker's per-call method hops on every alpha token.
+        self._known = frozenset(self.spell.word_frequency.dictionary.keys())
+        # pyspellchecker generates edit-distance candidates in pure Python per
+        # miss; symspellpy's precomputed delete-dictionary answers the same
+        # query in near-constant time. Optional — fall back if not installed.
+        self._sym = None
+        try:
+            from symspellpy import SymSpell, Verbosity
+            sym = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+            for w, f in self.spell.word_frequency.dictionary.items():
+                sym.create_dictionary_entry(w, f)
+            self._sym = sym
+            self._sym_verbosity = Verbosity.TOP
+        except ImportError:
+            pass
+
+    def _correct_word(self, low: str) -> str | None:
+        if self._sym is not None:
+            hits = self._sym.lookup(low, self._sym_verbosity, max_edit_distance=2)
+            return hits[0].term if hits else None
+        return self.spell.correction(low)
 
     def normalize_tokens(self, text: str) -> str:
-        toks = _retok(text.lower())
-        out = []
-        for t in toks:
-            if re.match(r"[A-Za-z]", t):
-                out.append(ABBREV.get(t, t))
-            else:
-                out.append(t)
-        return _smart_join(out)
+        # Single alternation pass over the lowercased text; also catches
+        # entries the old word tokenizer split apart ("gr8", "2day", "thik h").
+        return _ABBREV_RE.sub(_abbrev_sub, text.lower())
 
     def correct_spelling(self, text: str, use_lexicon: bool = True, lexicon_cutoff: float = 0.94) -> str:
         return self.correct_spelling_with_stats(text, use_lexicon, lexicon_cutoff)[0]
@@ -225,7 +367,7 @@ class SpellCorrector:
         alpha_tokens = 0
 
         for idx, t in enumerate(toks):
-            if not re.match(r"[A-Za-z]", t):
+            if not _RE_ALPHA_START.match(t):
                 fixed.append(t)
                 continue
 
@@ -242,14 +384,14 @@ class SpellCorrector:
 
             # Fallback to dictionary spellchecker
             low = t.lower()
-            if low not in self.spell and t.isalpha():
-                cand = self.spell.correction(low)
+            if low not in self._known and t.isalpha():
+                cand = self._correct_word(low)
                 # Preserve capitalization if original token looked like a name
                 fixed.append(cand.capitalize() if (cand and t[:1].isupper()) else (cand or t))
             else:
                 fixed.append(t)
 
-        out = _smart_join(fixed)
+        out = smart_join(fixed)
         out = _light_post_edits(out)
         stats = {"lexicon_hits": hits, "alpha_tokens": alpha_tokens, "locked_positions": locked_map}
         return out, stats
@@ -13,6 +13,38 @@ HOSTEL_CLUES = (
     "staying at", "room", "flat", "apartment", "rent",
 )
 
+# One Aho–Corasick automaton finds academic and hostel clues in a single
+# linear scan instead of ~30 separate substring searches per call. Optional:
+# without pyahocorasick the any(...) scans below are used unchanged.
+try:
+    import ahocorasick
+
+    _AC = ahocorasick.Automaton()
+    for _kw in ACADEMIC_KEYWORDS:
+        _AC.add_word(_kw, "academic")
+    for _kw in HOSTEL_CLUES:
+        _AC.add_word(_kw, "hostel")
+    _AC.make_automaton()
+except ImportError:
+    _AC = None
+
+def _scan_clues(low: str) -> tuple[bool, bool]:
+    """Return (has_academic, has_hostel) for the lowercased text."""
+    if _AC is not None:
+        has_academic = has_hostel = False
+        for _, tag in _AC.iter(low):
+            if tag == "academic":
+                has_academic = True
+            else:
+                has_hostel = True
+            if has_academic and has_hostel:
+                break
+        return has_academic, has_hostel
+    return (
+        any(k in low for k in ACADEMIC_KEYWORDS),
+        any(h in low for h in HOSTEL_CLUES),
+    )
+
 def prefer_studying(text: str) -> str:
     """
     Heuristic rewrite:
@@ -23,8 +55,7 @@ def prefer_studying(text: str) -> str:
     t = text
     low = t.lower()
 
-    has_academic = any(k in low for k in ACADEMIC_KEYWORDS)
-    has_hostel   = any(h in low for h in HOSTEL_CLUES)
+    has_academic, has_hostel = _scan_clues(low)
 
     if has_academic and not has_hostel:
         # common variants
@@ -1,8 +1,13 @@
 # utils/lexicon_loader.py
 import csv
+import pickle
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+# Parsed mappings are cached here as pickles keyed on the source file's
+# mtime, so warm boots skip CSV parsing/cell cleaning entirely.
+_CACHE_DIR = Path("data/.cache")
+
 # --------------------
 # Core helpers
 # --------------------
@@ -100,8 +105,37 @@ def _load_generic(path: str) -> Dict[str, str]:
     multi-column (canonical + aliases). Returns lowercase->canonical mapping.
     """
     p = Path(path)
+    cached = _cache_get(p)
+    if cached is not None:
+        return cached
     rows = _read_rows(p)
-    return _rows_to_mapping(rows, single_col_ok=True)
+    mapping = _rows_to_mapping(rows, single_col_ok=True)
+    _cache_put(p, mapping)
+    return mapping
+
+def _cache_path(src: Path) -> Path:
+    return _CACHE_DIR / (src.stem + ".pkl")
+
+def _cache_get(src: Path) -> Dict[str, str] | None:
+    """Return the cached mapping if it is at least as new as the CSV."""
+    cache = _cache_path(src)
+    try:
+        if src.exists() and cache.exists() and cache.stat().st_mtime >= src.stat().st_mtime:
+            with cache.open("rb") as f:
+                return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        pass  # unreadable/stale cache — fall through to a fresh parse
+    return None
+
+def _cache_put(src: Path, mapping: Dict[str, str]) -> None:
+    if not src.exists():
+        return  # nothing worth caching for a missing source
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with _cache_path(src).open("wb") as f:
+            pickle.dump(mapping, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # read-only deployments still work, just without the cache
 
 # --------------------
 # Public loaders
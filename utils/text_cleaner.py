@@ -1,5 +1,6 @@
 # utils/text_cleaner.py
 import re
+from functools import lru_cache
 
 # Basic unicode punctuation normalization maps
 QUOTE_MAP = {
@@ -12,6 +13,35 @@ DASH_MAP = {
 
 NBSP = "\u00A0"
 
+# Shared word/number/punct tokenizer — the same alternation is used by the
+# spell checker, the grammar guardrail, and app post-processing; compile it
+# once here and import it everywhere instead of re-spelling the pattern.
+# The pattern is scanned over the full paragraph several times per request,
+# so prefer google-re2's linear-time DFA engine when it is installed; the
+# backtracking stdlib engine remains the fallback (identical matches for
+# this alternation).
+_TOKEN_PATTERN = r"[A-Za-z][A-Za-z\-']*|\d+|[^\w\s]"
+try:
+    import re2 as _re2
+    TOKEN_RE = _re2.compile(_TOKEN_PATTERN)
+except ImportError:
+    TOKEN_RE = re.compile(_TOKEN_PATTERN)
+
+# Precompiled hot-path patterns (clean_text runs on every request; the
+# per-call re.* cache lookup adds up across the pipeline).
+_RE_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.;:!?])")
+_RE_SPACE_BEFORE_CLOSE = re.compile(r"\s+([\)\]\}])")
+_RE_PUNCT_THEN_WORD = re.compile(r"([,;:!?])([A-Za-z])")
+_RE_ISOLATED_DASH = re.compile(r"(?<![A-Za-z0-9])-(?![A-Za-z0-9])")
+_RE_DASH_SPACES = re.compile(r"\s*-\s*")
+_RE_WORD_DASH_WORD = re.compile(r"\b\s*-\s*\b")
+_RE_MULTI_SPACE = re.compile(r"\s+")
+_RE_REPEAT_TERMINAL = re.compile(r"([.!?])\1{1,}")
+_RE_REPEAT_COMMA = re.compile(r"(,)\1{1,}")
+_RE_TRAILING_WS_NL = re.compile(r"\s+\n")
+_RE_BLANK_LINES = re.compile(r"\n{3,}")
+_RE_SPACE_TAB_RUN = re.compile(r"[ \t]+")
+
 def _normalize_unicode_punct(t: str) -> str:
     # Normalize non-breaking spaces first
     t = t.replace(NBSP, " ")
@@ -25,30 +55,79 @@ def _normalize_unicode_punct(t: str) -> str:
 
 def _fix_spaces_around_punct(t: str) -> str:
     # Remove spaces before .,!?;: and closing quotes/brackets
-    t = re.sub(r"\s+([,.;:!?])", r"\1", t)
-    t = re.sub(r"\s+([\)\]\}])", r"\1", t)
+    t = _RE_SPACE_BEFORE_PUNCT.sub(r"\1", t)
+    t = _RE_SPACE_BEFORE_CLOSE.sub(r"\1", t)
 
     # Ensure a space after punctuation if followed by a word (avoid 3.14 type numbers)
-    t = re.sub(r"([,;:!?])([A-Za-z])", r"\1 \2", t)
+    t = _RE_PUNCT_THEN_WORD.sub(r"\1 \2", t)
 
     # Spaces around standalone dashes used as separators:
     # only when dash is not part of a hyphenated word on either side
-    t = re.sub(r"(?<![A-Za-z0-9])-(?![A-Za-z0-9])", " - ", t)  # isolated dash
-    t = re.sub(r"\s*-\s*", " - ", t)                           # normalize surrounding spaces
+    t = _RE_ISOLATED_DASH.sub(" - ", t)   # isolated dash
+    t = _RE_DASH_SPACES.sub(" - ", t)     # normalize surrounding spaces
     # But collapse back when it's clearly a hyphenated word segment
-    t = re.sub(r"\b\s*-\s*\b", "-", t)
+    t = _RE_WORD_DASH_WORD.sub("-", t)
 
     # Collapse extra spaces again
-    t = re.sub(r"\s+", " ", t)
+    t = _RE_MULTI_SPACE.sub(" ", t)
     return t.strip()
 
 def _collapse_repeated_punct(t: str) -> str:
     # Reduce multiple exclamations/question marks/periods to one
-    t = re.sub(r"([.!?])\1{1,}", r"\1", t)
+    t = _RE_REPEAT_TERMINAL.sub(r"\1", t)
     # Reduce multiple commas
-    t = re.sub(r"(,)\1{1,}", r"\1", t)
+    t = _RE_REPEAT_COMMA.sub(r"\1", t)
     return t
 
+def smart_join(tokens) -> str:
+    """
+    Join word/punct tokens back into text: one space before words/numbers,
+    punctuation flush against the preceding token. Single state-machine scan
+    with no trailing regex pass; replaces the near-duplicate _smart_join
+    helpers the model modules used to carry. Results are memoized on the
+    token tuple since the same spell-corrected text recurs across reruns.
+    """
+    return _smart_join_cached(tuple(tokens))
+
+@lru_cache(maxsize=1024)
+def _smart_join_cached(tokens: tuple) -> str:
+    parts = []
+    for tok in tokens:
+        if tok and tok[0].isalnum() and parts:
+            parts.append(" ")
+        parts.append(tok)
+    return "".join(parts).strip()
+
+def finalize(tokens) -> str:
+    """
+    Single left-to-right pass over a token list that fuses the old
+    dedupe → join → touch-up chain:
+    - drops adjacent duplicate words (case-insensitive)
+    - joins words/numbers with a single space, punctuation flush left
+      (which also yields the ", word" spacing the old touch-up added)
+    - keeps digit.digit sequences glued so 3.14-style numbers survive
+    No intermediate strings and no trailing regex pass.
+    """
+    parts = []
+    last_tok = ""
+    prev_tok = ""  # token before last_tok, for the decimal-number check
+    for tok in tokens:
+        if not tok:
+            continue
+        if tok[0].isalnum():
+            if tok.isalpha() and last_tok.isalpha() and tok.lower() == last_tok.lower():
+                prev_tok, last_tok = last_tok, tok
+                continue
+            # "3" "." "14" must rejoin as 3.14, not "3. 14"
+            is_decimal_tail = (
+                tok[0].isdigit() and last_tok == "." and prev_tok[-1:].isdigit()
+            )
+            if parts and not is_decimal_tail:
+                parts.append(" ")
+        parts.append(tok)
+        prev_tok, last_tok = last_tok, tok
+    return "".join(parts).strip()
+
 def clean_text(text: str) -> str:
     """
     Lightweight, conservative cleaning:
@@ -62,9 +141,9 @@ def clean_text(text: str) -> str:
         return ""
     t = str(text).strip()
     t = _normalize_unicode_punct(t)
-    t = re.sub(r"\s+\n", "\n", t)       # trim trailing spaces before newlines
-    t = re.sub(r"\n{3,}", "\n\n", t)    # limit excessive blank lines
-    t = re.sub(r"[ \t]+", " ", t)       # collapse runs of spaces/tabs
+    t = _RE_TRAILING_WS_NL.sub("\n", t)   # trim trailing spaces before newlines
+    t = _RE_BLANK_LINES.sub("\n\n", t)    # limit excessive blank lines
+    t = _RE_SPACE_TAB_RUN.sub(" ", t)     # collapse runs of spaces/tabs
     t = _collapse_repeated_punct(t)
     t = _fix_spaces_around_punct(t)
     return t